@@ -1,21 +1,48 @@
 #!/usr/bin/env python3
 # check the sanity of all config files under includes/
 
+import os
 import sys
+from argparse import ArgumentParser
 from pathlib import Path
 
-sys.path.append(str(Path(__file__).parents[1]))
+# plain os.path instead of Path(...).parents[1]: no PurePath construction
+# just to locate the repo root on the import path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import genisolist
 
+
+def find_inis(root):
+    """
+    Recursively yield .ini files under root.
+
+    os.walk already batches its scandir results, so the suffix check is a
+    C-level str.endswith per name with no extra stat or Path construction
+    for the non-ini files living in the tree.
+    """
+
+    for dirpath, _, filenames in os.walk(root, followlinks=False):
+        for name in filenames:
+            if name.endswith(".ini"):
+                yield Path(os.path.join(dirpath, name))
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <include_path>")
-        sys.exit(1)
-    test_path = Path(sys.argv[1])
+    parser = ArgumentParser("check-config")
+    parser.add_argument(
+        "include_path", help="Directory or ini file to check", type=Path
+    )
+    parser.add_argument(
+        "--no-per-file",
+        help="Skip per-file validation and only validate the merged config",
+        action="store_true",
+    )
+    args = parser.parse_args()
+    test_path = args.include_path
 
     if test_path.is_dir():
         print(f"Check directory: {test_path}")
-        inis = list(test_path.glob("**/*.ini"))
+        inis = list(find_inis(test_path))
     elif test_path.is_file() and test_path.suffix == ".ini":
         print(f"Check file: {test_path}")
         inis = [test_path]
@@ -23,21 +50,10 @@ if __name__ == "__main__":
         print(f"Invalid test target {test_path}")
         sys.exit(1)
 
-    all_sections = dict()
-
-    for ini in inis:
-        print(f"Checking {ini}...")
-        sections = genisolist.process_ini(ini)
-        # each file should be able to work as a standalone config
-        genisolist.gen_from_sections(sections, strict=True)
-        for s in sections:
-            assert (
-                s not in all_sections
-            ), f"Duplicated section {s} in {ini}, previously defined in {all_sections[s]['src']}"
-            sections[s]["src"] = ini
-        all_sections.update(sections)
-
-    # check the whole config
-    if len(inis) > 1:
-        print(f"Checking merged config...")
-        genisolist.gen_from_sections(all_sections, strict=True)
+    genisolist.check_inis(
+        inis,
+        do_per_file=not args.no_per_file,
+        # the merged config only needs a separate check when there is
+        # something to merge (or when per-file validation was skipped)
+        do_merged=len(inis) > 1 or args.no_per_file,
+    )
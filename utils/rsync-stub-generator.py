@@ -1,50 +1,206 @@
 #!/usr/bin/env python3
 # Use rsync to create stub testing files locally
 
+import os
+import re
+import shlex
 import subprocess
+import sys
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+# One --list-only line: permissions, size, date, time, then the name. A
+# single C-level match replaces the strip/split/split chain the loop used
+# to run per line; the trailing \s* swallows the newline (and any CR), so
+# lines need no strip() before matching, and motd/header lines simply
+# fail the match and are skipped.
+_LINE_RE = re.compile(r"^(\S+)\s+\S+\s+\S+\s+\S+\s+(.+?)\s*$")
 
-def main(upstream: str, dist: Path) -> None:
-    p = subprocess.run(
+
+def _parse_line(line: str):
+    """
+    Parse one listing line into a (perm, path, target) tuple, or None for
+    non-entry lines. Only symlink lines carry a " -> target" suffix; for
+    anything else an arrow is part of the file name, so the split is keyed
+    off the permission field.
+    """
+
+    m = _LINE_RE.match(line)
+    if m is None:
+        return None
+    perm, path = m.groups()
+    target = None
+    if perm.startswith("l"):
+        path, sep, target = path.partition(" -> ")
+        if not sep:
+            target = None
+    return perm, path, target
+
+
+def _parse_lines(lines: list) -> list:
+    """
+    Worker for --jobs: parse one batch of listing lines into
+    (perm, path, target) tuples, skipping non-entry lines.
+    """
+
+    out = []
+    for line in lines:
+        t = _parse_line(line)
+        if t is not None:
+            out.append(t)
+    return out
+
+
+def _create_stub(kind: str, path: str, target) -> None:
+    """
+    Perform the single filesystem call for one listing entry ("l" creates
+    a symlink to target, anything else touches a file). Runs on the
+    thread pool; mismatching existing symlinks raise RuntimeError.
+    """
+
+    if kind == "l":
+        # One readlink answers both "is it a symlink" and "does it match",
+        # so reruns against a populated dist tree cost a single syscall per
+        # link and no exception on the already-correct path
+        try:
+            existing = os.readlink(path)
+        except FileNotFoundError:
+            os.symlink(target, path)
+            return
+        except OSError:
+            existing = None  # exists but is not a symlink
+        if existing != target:
+            raise RuntimeError(
+                "Symlink already exists -- maybe you should nuke the dist directory first?\n"
+                f"Symlink: {path}\nTarget: {target}"
+            )
+    else:
+        # Path.touch() without the Path machinery (same 0o666 & umask mode)
+        os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o666))
+
+
+def _emit_shell(entries, dist_str: str) -> None:
+    """
+    Write a shell script to stdout that creates the stubs with batched
+    mkdir -p/touch invocations, instead of making the syscalls from
+    Python. Paths are shlex-quoted, so a hostile listing cannot inject
+    commands; pipe the output to sh to apply it.
+    """
+
+    out = sys.stdout
+    out.write("#!/bin/sh\nset -e\n")
+    created_dirs = set()
+    pending_dirs = []
+    pending_files = []
+
+    def flush(pending, cmd):
+        if pending:
+            out.write(f"{cmd} -- {' '.join(map(shlex.quote, pending))}\n")
+            pending.clear()
+
+    for perm, path, target in entries:
+        if perm.startswith("d"):
+            if path not in created_dirs:
+                pending_dirs.append(f"{dist_str}/{path}")
+                while path and path not in created_dirs:
+                    created_dirs.add(path)
+                    path = os.path.dirname(path)
+                if len(pending_dirs) >= 512:
+                    flush(pending_dirs, "mkdir -p")
+        elif perm.startswith("l"):
+            # parents must exist before their contents
+            flush(pending_dirs, "mkdir -p")
+            out.write(
+                f"ln -sfn -- {shlex.quote(target)} {shlex.quote(f'{dist_str}/{path}')}\n"
+            )
+        else:
+            flush(pending_dirs, "mkdir -p")
+            pending_files.append(f"{dist_str}/{path}")
+            if len(pending_files) >= 512:
+                flush(pending_files, "touch")
+    flush(pending_dirs, "mkdir -p")
+    flush(pending_files, "touch")
+
+
+def main(upstream: str, dist: Path, jobs: int = 1, shell: bool = False) -> None:
+    # Stream the listing: stub creation overlaps rsync's network I/O and
+    # the full listing (millions of lines for big mirrors) is never held
+    # in memory at once
+    p = subprocess.Popen(
         ["rsync", "-a", "--no-motd", "-r", "--list-only", upstream],
         stdout=subprocess.PIPE,
         text=True,
+        bufsize=1,
     )
-    if p.returncode != 0:
+    if jobs > 1:
+        # --jobs trades the streaming for parse throughput: buffer the
+        # whole listing, chunk it, and fan the GIL-bound regex parsing out
+        # to worker processes
+        lines = p.stdout.readlines()
+        batch = max(1, len(lines) // (4 * jobs))
+        line_batches = (lines[i : i + batch] for i in range(0, len(lines), batch))
+        with ProcessPoolExecutor(max_workers=jobs) as parse_pool:
+            entries = [
+                entry
+                for parsed in parse_pool.map(_parse_lines, line_batches)
+                for entry in parsed
+            ]
+    else:
+        entries = (t for t in map(_parse_line, p.stdout) if t is not None)
+
+    # Work with plain strings in the loop: every Path.joinpath would
+    # construct and re-validate a PurePath per line
+    dist_str = os.fspath(dist)
+    if shell:
+        _emit_shell(entries, dist_str)
+        if p.wait() != 0:
+            print("Failed to run rsync", file=sys.stderr)
+            exit(1)
+        return
+    created_dirs = set()
+    # Bounded window of in-flight stub creations: draining the oldest
+    # future keeps memory flat on multi-million-entry listings (an
+    # unbounded list would hold a Future per file) and surfaces a
+    # mismatched-symlink error promptly instead of after the whole run
+    pending = deque()
+    try:
+        # File/symlink creation is one syscall each and the GIL is released
+        # during it, so fan the calls out to threads to hide syscall
+        # latency; directories are created synchronously (rsync lists a
+        # directory before its contents, so parents exist before file
+        # stubs are queued)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for perm, path, target in entries:
+                if perm.startswith("d"):
+                    # listings repeat intermediate directories; skip known
+                    if path not in created_dirs:
+                        os.makedirs(f"{dist_str}/{path}", exist_ok=True)
+                        # makedirs created (or found) the whole chain, so
+                        # remember every ancestor as well
+                        while path and path not in created_dirs:
+                            created_dirs.add(path)
+                            path = os.path.dirname(path)
+                    continue
+                elif perm.startswith("l"):
+                    pending.append(
+                        executor.submit(_create_stub, "l", f"{dist_str}/{path}", target)
+                    )
+                else:
+                    pending.append(
+                        executor.submit(_create_stub, "-", f"{dist_str}/{path}", None)
+                    )
+                if len(pending) >= 1024:
+                    pending.popleft().result()
+            while pending:
+                pending.popleft().result()
+    except RuntimeError as e:
+        print(e)
+        exit(-1)
+    if p.wait() != 0:
         print("Failed to run rsync")
         exit(1)
-    for line in p.stdout.splitlines():
-        line = line.strip()
-        splitted = line.split(maxsplit=4)
-        perm = splitted[0]
-        path = splitted[-1]
-        if perm.startswith("d"):
-            dist.joinpath(path).mkdir(parents=True, exist_ok=True)
-        elif perm.startswith("l"):
-            # well that's a bit tricky
-            path = path.split(" -> ", maxsplit=1)
-            target = path[1]
-            symlink = dist.joinpath(path[0])
-            try:
-                symlink.symlink_to(target)
-            except FileExistsError:
-                # check if the symlink is the same as the target
-                if symlink.is_symlink():
-                    symlink_target = symlink.readlink()
-                    if str(symlink_target) == target:
-                        continue
-                    else:
-                        print(symlink_target, target)
-                print(
-                    "Symlink already exists -- maybe you should nuke the dist directory first?"
-                )
-                print("Symlink:", symlink)
-                print("Target:", target)
-                exit(-1)
-        else:
-            dist.joinpath(path).touch()
 
 
 if __name__ == "__main__":
@@ -60,6 +216,20 @@ if __name__ == "__main__":
         default=Path("."),
         help="Path to save stub files, defaults to current directory",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Parse the listing with this many worker processes "
+        "(buffers the whole listing in memory)",
+    )
+    parser.add_argument(
+        "--shell",
+        action="store_true",
+        help="Print a shell script creating the stubs (pipe to sh) "
+        "instead of creating them directly; note that ln -sfn replaces "
+        "mismatching symlinks rather than failing",
+    )
     args = parser.parse_args()
 
-    main(args.upstream, args.dist)
+    main(args.upstream, args.dist, args.jobs, args.shell)